@@ -5,10 +5,12 @@ import numpy as np
 
 from finam_graph import GraphDiagram
 
+RNG = np.random.default_rng()
+
 
 def generate_grid(grid_spec):
-    return np.random.random(grid_spec.data_size).reshape(
-        shape=grid_spec.data_shape, order=grid_spec.order
+    return RNG.random(grid_spec.data_size).reshape(
+        grid_spec.data_shape, order=grid_spec.order
     )
 
 
@@ -19,7 +21,7 @@ if __name__ == "__main__":
         callbacks={
             "Grid": (lambda t: generate_grid(grid), fm.Info(time=None, grid=grid)),
             "Scalar": (
-                lambda t: np.random.random(1)[0],
+                lambda t: RNG.random(),
                 fm.Info(time=None, grid=fm.NoGrid()),
             ),
         },
@@ -26,8 +26,13 @@ Graph data
 
     graph.Graph
 """
+import importlib
+from typing import TYPE_CHECKING
+
 from . import graph
-from .diagram import GraphColors, GraphDiagram, GraphSizes
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .diagram import GraphColors, GraphDiagram, GraphSizes
 
 try:
     from ._version import __version__
@@ -37,3 +42,23 @@ except ModuleNotFoundError:  # pragma: no cover
 
 
 __all__ = ["GraphDiagram", "GraphColors", "GraphSizes", "graph"]
+
+# diagram classes are imported on first access, to keep the package import light
+_LAZY_ATTRS = {
+    "GraphDiagram": ".diagram",
+    "GraphColors": ".diagram",
+    "GraphSizes": ".diagram",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRS:
+        module = importlib.import_module(_LAZY_ATTRS[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
@@ -1,4 +1,5 @@
 """Main module for graph diagram drawer"""
+import functools
 import math
 
 import matplotlib.pyplot as plt
@@ -7,9 +8,18 @@ from finam.interfaces import IComponent, ITimeComponent
 from matplotlib import patches
 from matplotlib.axes import Axes
 from matplotlib.backend_bases import MouseButton
+from matplotlib.collections import LineCollection, PatchCollection, PathCollection
+from matplotlib.colors import to_rgba
 from matplotlib.path import Path
 
-from finam_graph.graph import Graph
+from finam_graph.graph import Graph, _edge_indices, _topological_levels, _type_check
+
+_is_component = _type_check(IComponent)
+_is_time_component = _type_check(ITimeComponent)
+
+_CURVE_CODES = np.array(
+    [Path.MOVETO, Path.CURVE4, Path.CURVE4, Path.CURVE4], dtype=Path.code_type
+)
 
 
 class GraphSizes:
@@ -180,12 +190,20 @@ class GraphDiagram:
             Whether to show the diagram. Default: True
         block : bool, optional
             Should the diagram be shown in blocking mode? Default: True
-        save_path : pathlike, optional
-            Path to save image file. Default: None (i.e. don't save)
+        save_path : pathlike or file-like, optional
+            Path or binary file object to save the image to.
+            File objects are written in matplotlib's default ``savefig.format``.
+            Default: None (i.e. don't save)
         max_iterations : int, optional
             Maximum iterations for optimizing node placement. Default: 25000
         seed : int, optional
             Random seed for the optimizer. Default: None
+
+        Returns
+        -------
+        dict
+            Grid cell position tuples per component/adapter.
+            Can be passed as ``positions`` to subsequent calls to skip the layout optimization.
         """
         colors = colors or {}
         labels = labels or {}
@@ -218,7 +236,9 @@ class GraphDiagram:
 
         figure.subplots_adjust(left=0, right=1, top=1, bottom=0)
 
-        self._repaint(graph, positions, labels, colors, simple, show_adapters, ax)
+        artists = self._repaint(
+            graph, positions, labels, colors, simple, show_adapters, ax
+        )
 
         if save_path is not None:
             plt.savefig(save_path)
@@ -234,54 +254,68 @@ class GraphDiagram:
                 ax,
                 figure,
                 block,
+                artists,
             )
 
+        return positions
+
     def _show(
-        self, graph, positions, labels, colors, simple, show_adapters, ax, figure, block
+        self,
+        graph,
+        positions,
+        labels,
+        colors,
+        simple,
+        show_adapters,
+        ax,
+        figure,
+        block,
+        artists,
     ):
+        # first node per occupied cell, for hit tests
+        cells = _cell_map(positions)
+
+        def repaint():
+            nonlocal artists, cells
+            cells = _cell_map(positions)
+            artists = self._repaint(
+                graph, positions, labels, colors, simple, show_adapters, ax
+            )
+            # coalesces with other pending redraws on bursts of events
+            figure.canvas.draw_idle()
+
+        def select(comp_or_ada):
+            # selection only changes box colors, no need to repaint everything
+            previous, self.selected_cell = self.selected_cell, comp_or_ada
+            for node in (previous, comp_or_ada):
+                self._update_box_color(node, colors.get(node), artists)
+            figure.canvas.draw_idle()
+
         def onclick(event):
             if event.xdata is None:
                 return
 
             if event.button == MouseButton.RIGHT:
-                self.selected_cell = None
-                self._repaint(
-                    graph, positions, labels, colors, simple, show_adapters, ax
-                )
+                select(None)
                 return
 
-            xdata, ydata = event.xdata, event.ydata
-            cell = int(math.floor(xdata / self.sizes.grid_size[0])), int(
-                math.floor(ydata / self.sizes.grid_size[1])
-            )
+            grid_x, grid_y = self.sizes.grid_size
+            cell = int(event.xdata // grid_x), int(event.ydata // grid_y)
 
             if self.selected_cell is None:
-                for k, v in positions.items():
-                    if v == cell:
-                        self.selected_cell = k
-                        self._repaint(
-                            graph,
-                            positions,
-                            labels,
-                            colors,
-                            simple,
-                            show_adapters,
-                            ax,
-                        )
-                        break
+                node = cells.get(cell)
+                if node is not None:
+                    select(node)
             else:
                 positions[self.selected_cell] = cell
                 self.selected_cell = None
-                self._repaint(
-                    graph, positions, labels, colors, simple, show_adapters, ax
-                )
+                repaint()
 
         def on_press(event):
             if event.key == " ":
                 self.show_grid = not self.show_grid
-                self._repaint(
-                    graph, positions, labels, colors, simple, show_adapters, ax
-                )
+                artists[0].set_visible(self.show_grid)
+                figure.canvas.draw_idle()
 
         def on_close(_event):
             plt.close(figure)
@@ -304,10 +338,8 @@ class GraphDiagram:
         show_adapters: bool,
         axes: Axes,
     ):
-        while bool(axes.patches):
-            axes.patches[0].remove()
-        while bool(axes.texts):
-            axes.texts[0].remove()
+        for artist in [*axes.patches, *axes.texts, *axes.collections]:
+            artist.remove()
 
         x_bounds, y_bounds = _calc_bounds(positions)
         x_lim, y_lim = self._calc_limits(x_bounds, y_bounds)
@@ -315,11 +347,16 @@ class GraphDiagram:
         axes.set_xlim(*x_lim)
         axes.set_ylim(*y_lim)
 
-        if self.show_grid:
-            self._draw_grid(x_bounds, y_bounds, axes)
+        grid = self._draw_grid(x_bounds, y_bounds, axes)
+        grid.set_visible(self.show_grid)
 
+        # node and slot shapes are collected and added as a single collection,
+        # with the index of each node's box kept for color updates
+        shapes = []
+        boxes = {}
         comp_patches = {}
         for comp in graph.components:
+            boxes[comp] = len(shapes)
             comp_patches[comp] = self._draw_component(
                 comp,
                 positions[comp],
@@ -327,22 +364,38 @@ class GraphDiagram:
                 colors.get(comp),
                 simple,
                 labels,
+                shapes,
                 axes,
             )
 
         if show_adapters:
             for ad in graph.adapters:
+                boxes[ad] = len(shapes)
                 self._draw_adapter(
-                    ad, positions[ad], labels.get(ad), colors.get(ad), axes
+                    ad, positions[ad], labels.get(ad), colors.get(ad), shapes, axes
                 )
 
+        # limits are set explicitly, so collections skip updating the data limits
+        shapes = axes.add_collection(
+            PatchCollection(shapes, match_original=True), autolim=False
+        )
+
         if simple:
             self._draw_edges_simple(graph.simple_edges, positions, comp_patches, axes)
+        else:
+            edges = graph.edges if show_adapters else graph.direct_edges
+            self._draw_edges(edges, positions, show_adapters, axes)
+
+        return grid, shapes, boxes
+
+    def _update_box_color(self, comp_or_ada, color, artists):
+        _grid, shapes, boxes = artists
+        if comp_or_ada not in boxes:
             return
 
-        edges = graph.edges if show_adapters else graph.direct_edges
-        for edge in edges:
-            self._draw_edge(edge, positions, show_adapters, axes)
+        face_colors = shapes.get_facecolor()
+        face_colors[boxes[comp_or_ada]] = to_rgba(self._box_color(comp_or_ada, color))
+        shapes.set_facecolor(face_colors)
 
     def _calc_limits(self, x_min_max, y_min_max):
         x_lim = (
@@ -356,18 +409,30 @@ class GraphDiagram:
         return x_lim, y_lim
 
     def _draw_grid(self, x_bounds, y_bounds, axes: Axes):
-        for i in range(x_bounds[0] - 1, x_bounds[1] + 2):
-            for j in range(y_bounds[0] - 1, y_bounds[1] + 2):
-                rect = patches.Rectangle(
-                    (i * self.sizes.grid_size[0], j * self.sizes.grid_size[1]),
-                    *self.sizes.grid_size,
-                    linewidth=1,
-                    edgecolor="lightgrey",
-                    facecolor="none",
-                )
-                axes.add_patch(rect)
+        grid_x, grid_y = self.sizes.grid_size
+        x_min, x_max = (x_bounds[0] - 1) * grid_x, (x_bounds[1] + 2) * grid_x
+        y_min, y_max = (y_bounds[0] - 1) * grid_y, (y_bounds[1] + 2) * grid_y
+
+        lines = [
+            [(i * grid_x, y_min), (i * grid_x, y_max)]
+            for i in range(x_bounds[0] - 1, x_bounds[1] + 3)
+        ]
+        lines += [
+            [(x_min, j * grid_y), (x_max, j * grid_y)]
+            for j in range(y_bounds[0] - 1, y_bounds[1] + 3)
+        ]
+
+        return axes.add_collection(
+            LineCollection(lines, linewidths=1, colors="lightgrey", zorder=0),
+            autolim=False,
+        )
 
     def _draw_edges_simple(self, simple_edges, positions, comp_patches, axes: Axes):
+        # the boxes are drawn by a collection, arrows still need them in data
+        # coordinates for clipping
+        for rect in comp_patches.values():
+            rect.set_transform(axes.transData)
+
         drawn = set()
         for source, target in simple_edges:
             if (source, target) in drawn:
@@ -404,32 +469,50 @@ class GraphDiagram:
 
             axes.add_patch(arr)
 
-    def _draw_edge(self, edge, positions, show_adapters: bool, axes: Axes):
-        src_pos = self._comp_pos(edge.source, positions[edge.source])
-        trg_pos = self._comp_pos(edge.target, positions[edge.target])
-
-        if isinstance(edge.source, IComponent):
-            out_idx = list(edge.source.outputs.keys()).index(edge.out_name)
-            out_size = self.sizes.comp_slot_size
-        else:
-            out_idx = 0
-            out_size = self.sizes.adap_slot_size
+    def _draw_edges(self, edges, positions, show_adapters: bool, axes: Axes):
+        nodes = {node for edge in edges for node in (edge.source, edge.target)}
+        anchors = {node: self._slot_anchors(node, positions[node]) for node in nodes}
 
-        if isinstance(edge.target, IComponent):
-            in_idx = list(edge.target.inputs.keys()).index(edge.in_name)
-            in_size = self.sizes.comp_slot_size
-        else:
-            in_idx = 0
-            in_size = self.sizes.adap_slot_size
+        vertices = []
+        markers = []
+        for edge in edges:
+            p1, p2, p3, p4 = self._edge_vertices(edge, anchors)
+            vertices += (p1, p2, p3, p4)
+
+            if edge.num_adapters > 0 and not show_adapters:
+                pc = (p1[0] + p4[0]) / 2, (p1[1] + p4[1]) / 2
+                markers.append(
+                    patches.Rectangle(
+                        (pc[0] - 4, pc[1] - 4),
+                        8,
+                        8,
+                        linewidth=1,
+                        edgecolor="k",
+                        facecolor=self.colors.adapter_color,
+                    )
+                )
 
-        out_off = self._output_pos(edge.source, out_idx)
-        in_off = self._input_pos(edge.target, in_idx)
+                axes.text(
+                    *pc,
+                    str(edge.num_adapters),
+                    ha="center",
+                    va="center",
+                    size=6,
+                )
 
-        p1 = (
-            src_pos[0] + out_off[0] + out_size[0],
-            src_pos[1] + out_off[1] + out_size[1] / 2,
+        # all edges form a single compound path, adapter markers are on top of them
+        path = Path(np.reshape(vertices, (-1, 2)), np.tile(_CURVE_CODES, len(edges)))
+        axes.add_collection(
+            PathCollection([path], facecolors="none", edgecolors="k"), autolim=False
         )
-        p4 = trg_pos[0] + in_off[0], trg_pos[1] + in_off[1] + in_size[1] / 2
+        if markers:
+            axes.add_collection(
+                PatchCollection(markers, match_original=True), autolim=False
+            )
+
+    def _edge_vertices(self, edge, anchors):
+        p1 = anchors[edge.source][1][edge.out_index]
+        p4 = anchors[edge.target][0][edge.in_index]
 
         dx = abs(p4[0] - p1[0])
         curve_sz = max(self.sizes.curve_size, dx / 2)
@@ -437,60 +520,48 @@ class GraphDiagram:
         p2 = p1[0] + curve_sz, p1[1]
         p3 = p4[0] - curve_sz, p4[1]
 
-        axes.add_patch(
-            patches.PathPatch(
-                Path(
-                    [p1, p2, p3, p4],
-                    [Path.MOVETO, Path.CURVE4, Path.CURVE4, Path.CURVE4],
-                ),
-                fc="none",
-            )
-        )
+        return p1, p2, p3, p4
 
-        if edge.num_adapters > 0 and not show_adapters:
-            pc = (p1[0] + p4[0]) / 2, (p1[1] + p4[1]) / 2
-            axes.add_patch(
-                patches.Rectangle(
-                    (pc[0] - 4, pc[1] - 4),
-                    8,
-                    8,
-                    linewidth=1,
-                    edgecolor="k",
-                    facecolor=self.colors.adapter_color,
-                )
-            )
+    def _slot_anchors(self, comp_or_ada, position):
+        """Edge attachment points of all input and output slots of a node"""
+        xll, yll = self._comp_pos(comp_or_ada, position)
+        if _is_component(comp_or_ada):
+            slot_w, slot_h = self.sizes.comp_slot_size
+            in_count, out_count = len(comp_or_ada.inputs), len(comp_or_ada.outputs)
+        else:
+            slot_w, slot_h = self.sizes.adap_slot_size
+            in_count = out_count = 1
 
-            axes.text(
-                *pc,
-                str(edge.num_adapters),
-                ha="center",
-                va="center",
-                size=6,
-            )
+        inputs = []
+        for i in range(in_count):
+            x, y = self._input_pos(comp_or_ada, i)
+            inputs.append((xll + x, yll + y + slot_h / 2))
 
-    def _draw_component(self, comp, position, label, color, simple, labels, axes: Axes):
+        outputs = []
+        for i in range(out_count):
+            x, y = self._output_pos(comp_or_ada, i)
+            outputs.append((xll + x + slot_w, yll + y + slot_h / 2))
+
+        return inputs, outputs
+
+    def _draw_component(
+        self, comp, position, label, color, simple, labels, shapes, axes: Axes
+    ):
         name = label or comp.name
         xll, yll = self._comp_pos(comp, position)
 
         rect = patches.FancyBboxPatch(
             (xll, yll),
             *self.sizes.component_size,
-            boxstyle=f"round,rounding_size={self.corner_radius}",
+            boxstyle=_round_box(self.corner_radius, 0.3),
             linewidth=1,
             edgecolor="k",
-            facecolor=self.colors.selected_comp_color
-            if self.selected_cell == comp
-            else color
-            or (
-                self.colors.time_comp_color
-                if isinstance(comp, ITimeComponent)
-                else self.colors.comp_color
-            ),
+            facecolor=self._box_color(comp, color),
         )
-        axes.add_patch(rect)
+        shapes.append(rect)
 
         if not simple:
-            self._draw_slots(comp, labels, xll, yll, axes)
+            self._draw_slots(comp, labels, xll, yll, shapes, axes)
 
         axes.text(
             xll + self.sizes.component_size[0] / 2,
@@ -503,22 +574,24 @@ class GraphDiagram:
 
         return rect
 
-    def _draw_slots(self, comp, labels, xll, yll, axes):
+    def _draw_slots(self, comp, labels, xll, yll, shapes, axes):
+        slot_size = self.sizes.comp_slot_size
+
         if len(comp.inputs) > 0:
             for i, (n, inp) in enumerate(comp.inputs.items()):
                 in_name = labels.get(inp, n)
                 xlli, ylli = self._input_pos(comp, i)
                 inp_rect = patches.Rectangle(
                     (xll + xlli, yll + ylli),
-                    *self.sizes.comp_slot_size,
+                    *slot_size,
                     linewidth=1,
                     edgecolor="k",
                     facecolor="lightgrey",
                 )
-                axes.add_patch(inp_rect)
+                shapes.append(inp_rect)
                 axes.text(
                     xll + xlli + 2,
-                    yll + ylli + self.sizes.comp_slot_size[1] / 2,
+                    yll + ylli + slot_size[1] / 2,
                     _shorten_str(in_name, self.max_slot_label_length),
                     ha="left",
                     va="center",
@@ -531,34 +604,32 @@ class GraphDiagram:
                 xllo, yllo = self._output_pos(comp, i)
                 out_rect = patches.Rectangle(
                     (xll + xllo, yll + yllo),
-                    *self.sizes.comp_slot_size,
+                    *slot_size,
                     linewidth=1,
                     edgecolor="k",
                     facecolor="white",
                 )
-                axes.add_patch(out_rect)
+                shapes.append(out_rect)
                 axes.text(
                     xll + xllo + 2,
-                    yll + yllo + self.sizes.comp_slot_size[1] / 2,
+                    yll + yllo + slot_size[1] / 2,
                     _shorten_str(out_name, self.max_slot_label_length),
                     ha="left",
                     va="center",
                     size=7,
                 )
 
-    def _draw_adapter(self, comp, position, label, color, axes: Axes):
+    def _draw_adapter(self, comp, position, label, color, shapes, axes: Axes):
         name = label or comp.name
         xll, yll = self._comp_pos(comp, position)
 
         rect = patches.FancyBboxPatch(
             (xll, yll),
             *self.sizes.adapter_size,
-            boxstyle=f"round, pad=0, rounding_size={self.corner_radius}",
+            boxstyle=_round_box(self.corner_radius, 0),
             linewidth=1,
             edgecolor="k",
-            facecolor=self.colors.selected_adapter_color
-            if self.selected_cell == comp
-            else color or self.colors.adapter_color,
+            facecolor=self._box_color(comp, color),
         )
 
         xlli, ylli = self._input_pos(comp, 0)
@@ -579,9 +650,9 @@ class GraphDiagram:
             facecolor="white",
         )
 
-        axes.add_patch(rect)
-        axes.add_patch(inp)
-        axes.add_patch(out)
+        shapes.append(rect)
+        shapes.append(inp)
+        shapes.append(out)
 
         axes.text(
             xll + self.sizes.adapter_size[0] / 2,
@@ -592,8 +663,22 @@ class GraphDiagram:
             size=8,
         )
 
+    def _box_color(self, comp_or_ada, color):
+        if _is_component(comp_or_ada):
+            if self.selected_cell == comp_or_ada:
+                return self.colors.selected_comp_color
+            return color or (
+                self.colors.time_comp_color
+                if _is_time_component(comp_or_ada)
+                else self.colors.comp_color
+            )
+
+        if self.selected_cell == comp_or_ada:
+            return self.colors.selected_adapter_color
+        return color or self.colors.adapter_color
+
     def _comp_pos(self, comp_or_ada, pos):
-        if isinstance(comp_or_ada, IComponent):
+        if _is_component(comp_or_ada):
             return (
                 pos[0] * self.sizes.grid_size[0] + self.component_offset[0],
                 pos[1] * self.sizes.grid_size[1] + self.component_offset[1],
@@ -605,52 +690,61 @@ class GraphDiagram:
         )
 
     def _input_pos(self, comp_or_ada, idx):
-        if isinstance(comp_or_ada, IComponent):
+        sizes = self.sizes
+        if _is_component(comp_or_ada):
             cnt = len(comp_or_ada.inputs)
             inv_idx = cnt - 1 - idx
-            in_sp = self.sizes.component_size[1] / cnt
+            in_sp = sizes.component_size[1] / cnt
             return (
-                -self.sizes.comp_slot_size[0],
-                in_sp / 2 + in_sp * inv_idx - self.sizes.comp_slot_size[1] / 2,
+                -sizes.comp_slot_size[0],
+                in_sp / 2 + in_sp * inv_idx - sizes.comp_slot_size[1] / 2,
             )
 
         return (
-            -self.sizes.adap_slot_size[0],
-            self.sizes.adapter_size[1] / 2 - self.sizes.adap_slot_size[1] / 2,
+            -sizes.adap_slot_size[0],
+            sizes.adapter_size[1] / 2 - sizes.adap_slot_size[1] / 2,
         )
 
     def _output_pos(self, comp_or_ada, idx):
-        if isinstance(comp_or_ada, IComponent):
+        sizes = self.sizes
+        if _is_component(comp_or_ada):
             cnt = len(comp_or_ada.outputs)
             inv_idx = cnt - 1 - idx
-            out_sp = self.sizes.component_size[1] / cnt
+            out_sp = sizes.component_size[1] / cnt
             return (
-                self.sizes.component_size[0],
-                out_sp / 2 + out_sp * inv_idx - self.sizes.comp_slot_size[1] / 2,
+                sizes.component_size[0],
+                out_sp / 2 + out_sp * inv_idx - sizes.comp_slot_size[1] / 2,
             )
 
         return (
-            self.sizes.adapter_size[0],
-            self.sizes.adapter_size[1] / 2 - self.sizes.adap_slot_size[1] / 2,
+            sizes.adapter_size[0],
+            sizes.adapter_size[1] / 2 - sizes.adap_slot_size[1] / 2,
         )
 
 
 def _calc_bounds(positions):
-    x_min, y_min = 99999, 99999
-    x_max, y_max = -99999, -99999
-    for _c, pos in positions.items():
-        if pos[0] < x_min:
-            x_min = pos[0]
-        if pos[1] < y_min:
-            y_min = pos[1]
-        if pos[0] > x_max:
-            x_max = pos[0]
-        if pos[1] > y_max:
-            y_max = pos[1]
+    if not positions:
+        return (0, 0), (0, 0)
 
+    pos = np.array(list(positions.values()))
+    (x_min, y_min), (x_max, y_max) = pos.min(axis=0).tolist(), pos.max(axis=0).tolist()
     return (x_min, x_max), (y_min, y_max)
 
 
+@functools.lru_cache(maxsize=None)
+def _round_box(rounding_size, pad):
+    """Box style for rounded boxes, created once instead of parsed per patch"""
+    return patches.BoxStyle.Round(pad=pad, rounding_size=rounding_size)
+
+
+def _cell_map(positions):
+    cells = {}
+    for node, cell in positions.items():
+        cells.setdefault(tuple(cell), node)
+    return cells
+
+
+@functools.lru_cache(maxsize=1024)
 def _shorten_str(s, max_length):
     if len(s) > max_length:
         return s[0 : (max(1, max_length - 1))]
@@ -664,115 +758,170 @@ def _optimize_positions(
     if show_adapters:
         length += len(graph.adapters)
     size = math.ceil(math.sqrt(length)) * 3
-    grid = np.ndarray((size, size), dtype=object)
+    # grid cells hold node indices, -1 for empty cells
+    grid = np.full((size, size), -1, dtype=np.intp)
 
-    all_mods = (
-        set.union(graph.components, graph.adapters)
-        if show_adapters
-        else graph.components
-    )
-    pos = _random_initial_positions(all_mods, grid, size, rng)
+    all_mods = graph.components + graph.adapters if show_adapters else graph.components
+    edges = graph.edges if show_adapters else graph.direct_edges
+    if simple:
+        levels = [None] * len(all_mods)
+    else:
+        levels = _topological_levels(all_mods, edges)
+    pos = _initial_positions(levels, grid, size, rng)
 
-    nodes = list(pos.keys())
-    nodes.sort(key=lambda co: co.__class__.__name__)
+    order = sorted(range(len(all_mods)), key=lambda i: type(all_mods[i]).__name__)
+    nodes = [all_mods[i] for i in order]
+    pos = [pos[i] for i in order]
+    # renumber the grid cells to the sorted node order
+    new_index = np.empty(len(order) + 1, dtype=np.intp)
+    new_index[order] = np.arange(len(order))
+    new_index[-1] = -1
+    grid[:] = new_index[grid]
 
-    return _do_optimize_positions(
-        graph, nodes, simple, show_adapters, pos, grid, size, max_iterations, rng
-    )
+    src, trg = _edge_indices(nodes, edges)
 
+    edges = list(zip(src.tolist(), trg.tolist()))
+    pos = _do_optimize_positions(pos, grid, edges, simple, size, max_iterations, rng)
+    return dict(zip(nodes, pos))
 
-def _do_optimize_positions(
-    graph, nodes, simple, show_adapters, pos, grid, size, max_iterations, rng
-):
+
+def _do_optimize_positions(pos, grid, edges, simple, size, max_iterations, rng):
     print("Optimizing graph layout...")
 
-    score = _rate_positions(
-        pos, graph.edges if show_adapters else graph.direct_edges, simple
-    )
+    # only edges attached to moved nodes are rescored, and the sum is kept
+    # unsquared during optimization, which ranks layouts the same
+    incident = _incident_edges(len(pos), edges)
+    edge_scores = _rate_edges(pos, edges, simple)
+    score = sum(edge_scores, 0.0)
 
     last_improvement = 0
     i = -1
-    for i in range(max_iterations):
-        pos_new = dict(pos)
-        grid_new = grid.copy()
-
-        for _j in range(rng.integers(1, 5, 1)[0]):
-            node = rng.choice(nodes)
-            x, y = rng.integers(0, size, 2)
-
-            node_here = grid_new[x, y]
-            if node_here == node:
-                continue
-
-            if node_here is None:
-                grid_new[pos_new[node]] = None
-                grid_new[x, y] = node
-                pos_new[node] = (x, y)
-            else:
-                grid_new[pos_new[node]] = node_here
-                grid_new[x, y] = node
-                pos_new[node_here] = pos_new[node]
-                pos_new[node] = (x, y)
-
-        score_new = _rate_positions(
-            pos_new, graph.edges if show_adapters else graph.direct_edges, simple
-        )
+    for i, proposed in zip(range(max_iterations), _random_moves(rng, len(pos), size)):
+        # moves are applied in place and rolled back if rejected
+        moves, affected = _apply_moves(pos, grid, proposed, incident)
+        new_scores = _rate_edges(pos, [edges[e] for e in affected], simple)
+        score_new = score + sum(new_scores) - sum(edge_scores[e] for e in affected)
 
         if score_new <= score:
             if score_new < score:
                 last_improvement = i
-
-            pos = pos_new
-            grid = grid_new
             score = score_new
+            for e, edge_score in zip(affected, new_scores):
+                edge_scores[e] = edge_score
+        else:
+            for move in reversed(moves):
+                _move_node(pos, grid, *move)
 
-        if i > 2500 and i > 4 * last_improvement:
+        # a score of zero can't be improved
+        if score == 0 or (i > 2500 and i > 4 * last_improvement):
             break
 
-    print(f"Done ({i + 1} iterations, score {score})")
+    print(f"Done ({i + 1} iterations, score {score**2})")
 
     return pos
 
 
-def _random_initial_positions(all_mods, grid, size, rng):
-    pos = {}
-    for c in all_mods:
-        while True:
-            x, y = rng.integers(0, size, 2)
-            if grid[x, y] is None:
-                grid[x, y] = c
-                break
-        pos[c] = x, y
+def _incident_edges(num_nodes, edges):
+    incident = [[] for _ in range(num_nodes)]
+    for e, (i, j) in enumerate(edges):
+        incident[i].append(e)
+        incident[j].append(e)
+    return incident
+
+
+def _random_moves(rng, num_nodes, size, block_size=1000):
+    """Generate random moves per iteration, drawing random numbers in blocks"""
+    while True:
+        counts = rng.integers(1, 5, block_size).tolist()
+        nodes = rng.integers(0, num_nodes, 4 * block_size).tolist()
+        cells = list(map(tuple, rng.integers(0, size, (4 * block_size, 2)).tolist()))
+
+        start = 0
+        for count in counts:
+            end = start + count
+            yield zip(nodes[start:end], cells[start:end])
+            start = end
+
+
+def _apply_moves(pos, grid, proposed, incident):
+    """Apply moves, returning them for rollback together with the affected edges"""
+    moves = []
+    affected = set()
+    for node, cell in proposed:
+        node_here = grid.item(cell)
+        if node_here == node:
+            continue
+
+        affected.update(incident[node])
+        if node_here >= 0:
+            affected.update(incident[node_here])
+
+        moves.append((node, pos[node], node_here))
+        _move_node(pos, grid, node, cell, node_here)
+
+    return moves, list(affected)
+
+
+def _move_node(pos, grid, node, cell, node_here):
+    """Move a node to a cell, swapping places with the node already there (or -1)"""
+    old_cell = pos[node]
+    grid[old_cell] = node_here
+    grid[cell] = node
+    if node_here >= 0:
+        pos[node_here] = old_cell
+    pos[node] = cell
+
+
+def _initial_positions(levels, grid, size, rng):
+    # all cells in random order, for nodes without level or with a full column
+    random_cells = iter(rng.permutation(size * size).tolist())
+
+    pos = []
+    for i, level in enumerate(levels):
+        cell = None
+        if level is not None:
+            cell = _free_cell_in_column(grid, min(level, size - 1), rng)
+
+        while cell is None:
+            x, y = divmod(next(random_cells), size)
+            if grid[x, y] < 0:
+                cell = x, y
+
+        grid[cell] = i
+        pos.append(cell)
 
     return pos
 
 
-def _rate_positions(pos, edges, simple: bool):
-    score = 0.0
+def _free_cell_in_column(grid, x, rng):
+    free = np.flatnonzero(grid[x] < 0)
+    if free.size == 0:
+        return None
+    return x, int(rng.choice(free))
 
-    if simple:
-        for e in edges:
-            p1 = pos[e.source]
-            p2 = pos[e.target]
 
-            dist = abs(p2[0] - p1[0]) + abs(p2[1] - p1[1])
-            score += dist
+def _rate_edges(pos, edges, simple: bool):
+    scores = []
+
+    if simple:
+        for i, j in edges:
+            (x1, y1), (x2, y2) = pos[i], pos[j]
+            scores.append(abs(x2 - x1) + abs(y2 - y1))
     else:
-        for e in edges:
-            p1 = pos[e.source]
-            p2 = pos[e.target]
+        for i, j in edges:
+            (x1, y1), (x2, y2) = pos[i], pos[j]
 
-            dx = p2[0] - (p1[0] + 1)
+            dx = x2 - (x1 + 1)
 
             sc_rev_same_row = 0
             sc_x = dx
             if dx < 0:
-                if p2[1] == p1[1]:
+                if y2 == y1:
                     sc_rev_same_row = 5
                 if dx < -1:
                     sc_x *= 2
 
-            dist = abs(sc_x) + max(0, abs(p2[1] - p1[1]) - 0.5) + sc_rev_same_row
-            score += dist
+            dist = abs(sc_x) + max(0, abs(y2 - y1) - 0.5) + sc_rev_same_row
+            scores.append(dist)
 
-    return score**2
+    return scores
@@ -1,102 +1,74 @@
 """Helpers for graph analysis"""
+from typing import Any, NamedTuple, Optional
+
+import numpy as np
 from finam import Composition
-from finam.interfaces import IAdapter, IInput, IOutput
+from finam.interfaces import IAdapter, IInput
 
 
 class Graph:
-    """Container for graph data"""
+    """Container for graph data
+
+    Components and adapters are stored as tuples in discovery order,
+    so that layouts are reproducible for a given random seed.
+    """
 
     def __init__(self, comp: Composition, excluded: set):
         self.components, self.adapters, self.edges, self.direct_edges = _get_graph(
             comp, excluded
         )
-        self.simple_edges = set()
-        for edge in self.direct_edges:
-            self.simple_edges.add((edge.source, edge.target))
+        self.simple_edges = {(e.source, e.target) for e in self.direct_edges}
 
 
 def _get_graph(composition, excluded):
-    components, adapters, direct_edges = _get_graph_nodes(composition, excluded)
-
-    edges = _get_component_edges(components, adapters, excluded)
-    edges = edges.union(_get_adapter_edges(adapters))
-
-    return components, adapters, edges, direct_edges
-
-
-def _get_component_edges(components, adapters, excluded):
-    edges = set()
-
-    output_map = _map_outputs(components)
-
-    for comp in components:
-        if comp in excluded:
-            continue
-        for i, (n, inp) in enumerate(comp.inputs.items()):
-            src = inp.get_source()
-            if isinstance(src, IAdapter) and src in adapters:
-                edges.add(Edge(src, None, 0, comp, n, i, 0))
-                continue
-            comp2, ii = output_map[src]
-            if comp2 not in excluded:
-                edges.add(Edge(comp2, src.name, ii, comp, n, i, 0))
-
-        for i, (n, out) in enumerate(comp.outputs.items()):
-            if comp in excluded:
-                continue
-            for trg in out.get_targets():
-                if isinstance(trg, IAdapter) and trg in adapters:
-                    edges.add(Edge(comp, n, i, trg, None, 0, 0))
-
-    return edges
-
-
-def _get_adapter_edges(adapters):
+    components = []
+    adapters = {}
     edges = set()
-
-    for ad in adapters:
-        src = ad.get_source()
-        if isinstance(src, IAdapter):
-            edges.add(Edge(src, None, 0, ad, None, 0, 0))
-        for trg in ad.get_targets():
-            if isinstance(trg, IAdapter):
-                edges.add(Edge(ad, None, 0, trg, None, 0, 0))
-
-    return edges
-
-
-def _get_graph_nodes(composition, excluded):
-    components = set()
-    adapters = set()
     direct_edges = set()
 
     output_map = _map_outputs(composition.modules)
+    is_adapter = _type_check(IAdapter)
+    # traced adapters with their output and number of adapters up to it
+    upstream = {}
 
     for comp in composition.modules:
         if comp in excluded:
             continue
 
-        components.add(comp)
+        components.append(comp)
         for i, (n, inp) in enumerate(comp.inputs.items()):
-            temp_adapters = set()
-            out, depth = _trace_input(inp, temp_adapters)
+            chain = []
+            out, depth, joint = _trace_input(inp, chain, is_adapter, upstream)
             if out is None:
                 continue
             comp2, ii = output_map[out]
-            if comp2 not in excluded:
-                adapters.update(temp_adapters)
-                direct_edges.add(Edge(comp2, out.name, ii, comp, n, i, depth))
+            if comp2 in excluded:
+                continue
 
-    return components, adapters, direct_edges
+            adapters.update(dict.fromkeys(reversed(chain)))
+            edge = Edge(comp2, out.name, ii, comp, n, i, depth)
+            direct_edges.add(edge)
+            _add_chain_edges(edges, edge, chain, joint)
 
+    return tuple(components), tuple(adapters), edges, direct_edges
 
-def _map_inputs(components):
-    input_map = {}
-    for comp in components:
-        for i, (_n, inp) in enumerate(comp.inputs.items()):
-            input_map[inp] = comp, i
 
-    return input_map
+def _add_chain_edges(edges, direct_edge, chain, joint):
+    trg, in_name, in_index = (
+        direct_edge.target,
+        direct_edge.in_name,
+        direct_edge.in_index,
+    )
+    for ad in chain:
+        edges.add(Edge(ad, None, 0, trg, in_name, in_index, 0))
+        trg, in_name, in_index = ad, None, 0
+
+    if joint is None:
+        src, out_name, out_index = direct_edge[:3]
+        edges.add(Edge(src, out_name, out_index, trg, in_name, in_index, 0))
+    else:
+        # the chain joins an already traced adapter, the rest is known
+        edges.add(Edge(joint, None, 0, trg, in_name, in_index, 0))
 
 
 def _map_outputs(components):
@@ -108,53 +80,89 @@ def _map_outputs(components):
     return output_map
 
 
-def _trace_input(inp: IInput, out_adapters: set, depth=0):
+def _trace_input(inp: IInput, out_adapters: list, is_adapter, upstream: dict):
+    joint = None
+    depth = 0
     src = inp.get_source()
-    if src is None:
-        return None, depth
+    while is_adapter(src):
+        if src in upstream:
+            joint = src
+            src, depth = upstream[src]
+            break
+
+        out_adapters.append(src)
+        src = src.get_source()
+
+    depth += len(out_adapters)
+    for i, ad in enumerate(out_adapters):
+        upstream[ad] = src, depth - i
+
+    return src, depth, joint
+
 
-    if isinstance(src, IAdapter):
-        out_adapters.add(src)
-        return _trace_input(src, out_adapters, depth + 1)
+def _edge_indices(nodes, edges):
+    """Source and target node indices of all edges, as integer arrays"""
+    index = {node: i for i, node in enumerate(nodes)}
+    src = np.fromiter((index[e.source] for e in edges), dtype=int, count=len(edges))
+    trg = np.fromiter((index[e.target] for e in edges), dtype=int, count=len(edges))
+    return src, trg
 
-    return src, depth
 
+def _topological_levels(nodes, edges):
+    """Longest distance of each node from the graph's sources, using Kahn's algorithm.
 
-def _trace_output(out: IOutput, out_adapters: set):
-    for trg in out.get_targets():
-        if isinstance(trg, IAdapter):
-            out_adapters.add(trg)
-            _trace_output(trg, out_adapters)
+    Nodes on cycles are placed one level after their last resolved predecessor.
+    """
+    count = len(nodes)
+    src, trg = _edge_indices(nodes, edges)
 
+    indptr = np.zeros(count + 1, dtype=int)
+    np.cumsum(np.bincount(src, minlength=count), out=indptr[1:])
+    indices = trg[np.argsort(src, kind="stable")]
 
-class Edge:
+    indptr = indptr.tolist()
+    indices = indices.tolist()
+    in_degree = np.bincount(trg, minlength=count).tolist()
+    levels = [0] * count
+
+    stack = [i for i, deg in enumerate(in_degree) if deg == 0]
+    while stack:
+        i = stack.pop()
+        level = levels[i] + 1
+        for j in indices[indptr[i] : indptr[i + 1]]:
+            if levels[j] < level:
+                levels[j] = level
+            in_degree[j] -= 1
+            if in_degree[j] == 0:
+                stack.append(j)
+
+    return levels
+
+
+def _type_check(interface):
+    """Create a replacement for ``isinstance(obj, interface)`` that caches results per type"""
+    cache = {}
+
+    def check(obj):
+        tp = type(obj)
+        result = cache.get(tp)
+        if result is None:
+            result = cache[tp] = isinstance(obj, interface)
+        return result
+
+    return check
+
+
+class Edge(NamedTuple):
     """Representation of a graph edge"""
 
-    def __init__(
-        self, source, out_name, out_index, target, in_name, in_index, num_adapters
-    ):
-        self.source = source
-        self.out_name = out_name
-        self.out_index = out_index
-        self.target = target
-        self.in_name = in_name
-        self.in_index = in_index
-        self.num_adapters = num_adapters
-
-    def __hash__(self):
-        return hash((self.source, self.out_name, self.target, self.in_name))
-
-    def __eq__(self, other):
-        return (
-            self.__class__ == other.__class__
-            and self.source == other.source
-            and self.out_name == other.out_name
-            and self.out_index == other.out_index
-            and self.target == other.target
-            and self.in_name == other.in_name
-            and self.in_index == other.in_index
-            and self.num_adapters == other.num_adapters
-        )
+    source: Any
+    out_name: Optional[str]
+    out_index: int
+    target: Any
+    in_name: Optional[str]
+    in_index: int
+    num_adapters: int
 
     def __repr__(self):
         return (
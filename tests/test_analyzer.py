@@ -1,10 +1,11 @@
+import sys
 import unittest
 from datetime import datetime, timedelta
 
 import finam as fm
 import numpy as np
 
-from finam_graph.graph import Graph
+from finam_graph.graph import Graph, _topological_levels
 
 
 def generate_grid(grid):
@@ -13,6 +14,22 @@ def generate_grid(grid):
     )
 
 
+def _scalar_source():
+    return fm.modules.CallbackGenerator(
+        callbacks={"Out": (lambda t: 1.0, fm.Info(time=None, grid=fm.NoGrid()))},
+        start=datetime(2000, 1, 1),
+        step=timedelta(days=1),
+    )
+
+
+def _scalar_consumer():
+    return fm.modules.DebugConsumer(
+        inputs={"Input": fm.Info(time=None, grid=fm.NoGrid())},
+        start=datetime(2000, 1, 1),
+        step=timedelta(days=1),
+    )
+
+
 class TestCompAnalyzer(unittest.TestCase):
     def test_analyze(self):
         grid = fm.UniformGrid((10, 5))
@@ -24,16 +41,8 @@ class TestCompAnalyzer(unittest.TestCase):
             start=datetime(2000, 1, 1),
             step=timedelta(days=7),
         )
-        consumer = fm.modules.DebugConsumer(
-            inputs={"Input": fm.Info(time=None, grid=fm.NoGrid())},
-            start=datetime(2000, 1, 1),
-            step=timedelta(days=1),
-        )
-        consumer2 = fm.modules.DebugConsumer(
-            inputs={"Input": fm.Info(time=None, grid=fm.NoGrid())},
-            start=datetime(2000, 1, 1),
-            step=timedelta(days=1),
-        )
+        consumer = _scalar_consumer()
+        consumer2 = _scalar_consumer()
 
         grid_to_val = fm.adapters.GridToValue(np.mean)
         lin_interp = fm.adapters.LinearTime()
@@ -57,6 +66,12 @@ class TestCompAnalyzer(unittest.TestCase):
         self.assertEqual(len(graph.direct_edges), 2)
         self.assertEqual(len(graph.simple_edges), 2)
 
+        nodes = [source, grid_to_val, lin_interp, consumer, consumer2]
+        self.assertEqual(_topological_levels(nodes, graph.edges), [0, 1, 2, 3, 1])
+        self.assertEqual(
+            _topological_levels(graph.components, graph.direct_edges), [0, 1, 1]
+        )
+
     def test_analyze_exclude(self):
         grid = fm.UniformGrid((10, 5))
 
@@ -67,21 +82,9 @@ class TestCompAnalyzer(unittest.TestCase):
             start=datetime(2000, 1, 1),
             step=timedelta(days=7),
         )
-        consumer = fm.modules.DebugConsumer(
-            inputs={"Input": fm.Info(time=None, grid=fm.NoGrid())},
-            start=datetime(2000, 1, 1),
-            step=timedelta(days=1),
-        )
-        consumer2 = fm.modules.DebugConsumer(
-            inputs={"Input": fm.Info(time=None, grid=fm.NoGrid())},
-            start=datetime(2000, 1, 1),
-            step=timedelta(days=1),
-        )
-        consumer3 = fm.modules.DebugConsumer(
-            inputs={"Input": fm.Info(time=None, grid=fm.NoGrid())},
-            start=datetime(2000, 1, 1),
-            step=timedelta(days=1),
-        )
+        consumer = _scalar_consumer()
+        consumer2 = _scalar_consumer()
+        consumer3 = _scalar_consumer()
 
         grid_to_val = fm.adapters.GridToValue(np.mean)
         grid_to_val_2 = fm.adapters.GridToValue(np.mean)
@@ -106,3 +109,79 @@ class TestCompAnalyzer(unittest.TestCase):
         self.assertEqual(len(graph.edges), 4)
         self.assertEqual(len(graph.direct_edges), 2)
         self.assertEqual(len(graph.simple_edges), 2)
+
+    def test_analyze_exclude_shared_adapter(self):
+        source = _scalar_source()
+        consumer = _scalar_consumer()
+        consumer2 = _scalar_consumer()
+
+        shared = fm.adapters.Scale(1.0)
+        scale = fm.adapters.Scale(2.0)
+        scale2 = fm.adapters.Scale(3.0)
+
+        composition = fm.Composition([source, consumer, consumer2])
+        composition.initialize()
+
+        _ = source.outputs["Out"] >> shared
+        _ = shared >> scale >> consumer.inputs["Input"]
+        _ = shared >> scale2 >> consumer2.inputs["Input"]
+
+        graph = Graph(composition, {consumer2})
+        self.assertEqual(len(graph.components), 2)
+        self.assertEqual(len(graph.adapters), 2)
+        self.assertEqual(len(graph.edges), 3)
+        self.assertEqual(len(graph.direct_edges), 1)
+
+        nodes = set(graph.components) | set(graph.adapters)
+        for edge in graph.edges:
+            self.assertIn(edge.source, nodes)
+            self.assertIn(edge.target, nodes)
+
+    def test_analyze_shared_adapter_chain(self):
+        source = _scalar_source()
+        consumer = _scalar_consumer()
+        consumer2 = _scalar_consumer()
+
+        shared = fm.adapters.Scale(1.0)
+        shared2 = fm.adapters.Scale(1.0)
+        scale = fm.adapters.Scale(2.0)
+
+        composition = fm.Composition([source, consumer, consumer2])
+        composition.initialize()
+
+        _ = source.outputs["Out"] >> shared >> shared2
+        _ = shared2 >> scale >> consumer.inputs["Input"]
+        _ = shared2 >> consumer2.inputs["Input"]
+
+        graph = Graph(composition, set())
+        self.assertEqual(len(graph.components), 3)
+        self.assertEqual(len(graph.adapters), 3)
+        self.assertEqual(len(graph.edges), 5)
+        self.assertEqual(len(graph.direct_edges), 2)
+
+        num_adapters = {e.target: e.num_adapters for e in graph.direct_edges}
+        self.assertEqual(num_adapters, {consumer: 3, consumer2: 2})
+
+        # the second consumer joins the already traced chain at shared2
+        self.assertIn((shared2, consumer2), {(e.source, e.target) for e in graph.edges})
+        self.assertEqual({e.source for e in graph.direct_edges}, {source})
+
+    def test_analyze_long_chain(self):
+        source = _scalar_source()
+        consumer = _scalar_consumer()
+
+        composition = fm.Composition([source, consumer])
+        composition.initialize()
+
+        num_adapters = 2 * sys.getrecursionlimit()
+        out = source.outputs["Out"]
+        for _ in range(num_adapters):
+            out = out >> fm.adapters.Scale(1.0)
+        _ = out >> consumer.inputs["Input"]
+
+        graph = Graph(composition, set())
+        self.assertEqual(len(graph.components), 2)
+        self.assertEqual(len(graph.adapters), num_adapters)
+        self.assertEqual(len(graph.edges), num_adapters + 1)
+        self.assertEqual(len(graph.direct_edges), 1)
+        self.assertEqual(next(iter(graph.direct_edges)).num_adapters, num_adapters)
@@ -1,12 +1,18 @@
-import os
+import io
 import unittest
+from contextlib import redirect_stdout
 from datetime import datetime, timedelta
-from tempfile import TemporaryDirectory
 
 import finam as fm
+import matplotlib
 import numpy as np
 
 from finam_graph import GraphDiagram
+from finam_graph.diagram import _optimize_positions
+from finam_graph.graph import Graph
+
+# non-interactive backend, the tests only save or discard figures
+matplotlib.use("Agg")
 
 
 def generate_grid(grid):
@@ -15,6 +21,22 @@ def generate_grid(grid):
     )
 
 
+def _scalar_source():
+    return fm.modules.CallbackGenerator(
+        callbacks={"Out": (lambda t: 1.0, fm.Info(time=None, grid=fm.NoGrid()))},
+        start=datetime(2000, 1, 1),
+        step=timedelta(days=1),
+    )
+
+
+def _scalar_consumer():
+    return fm.modules.DebugConsumer(
+        inputs={"Input": fm.Info(time=None, grid=fm.NoGrid())},
+        start=datetime(2000, 1, 1),
+        step=timedelta(days=1),
+    )
+
+
 class TestDiagram(unittest.TestCase):
     def test_diagram(self):
         grid = fm.UniformGrid((10, 5))
@@ -30,21 +52,9 @@ class TestDiagram(unittest.TestCase):
             start=datetime(2000, 1, 1),
             step=timedelta(days=7),
         )
-        consumer = fm.modules.DebugConsumer(
-            inputs={"Input": fm.Info(time=None, grid=fm.NoGrid())},
-            start=datetime(2000, 1, 1),
-            step=timedelta(days=1),
-        )
-        consumer2 = fm.modules.DebugConsumer(
-            inputs={"Input": fm.Info(time=None, grid=fm.NoGrid())},
-            start=datetime(2000, 1, 1),
-            step=timedelta(days=1),
-        )
-        consumer3 = fm.modules.DebugConsumer(
-            inputs={"Input": fm.Info(time=None, grid=fm.NoGrid())},
-            start=datetime(2000, 1, 1),
-            step=timedelta(days=1),
-        )
+        consumer = _scalar_consumer()
+        consumer2 = _scalar_consumer()
+        consumer3 = _scalar_consumer()
 
         grid_to_val = fm.adapters.GridToValue(np.mean)
         grid_to_val2 = fm.adapters.GridToValue(np.mean)
@@ -64,19 +74,63 @@ class TestDiagram(unittest.TestCase):
 
         _ = source.outputs["Scalar"] >> consumer3.inputs["Input"]
 
-        with TemporaryDirectory() as tmp:
-            file_path = os.path.join(tmp, "test.svg")
-            GraphDiagram().draw(
-                composition,
-                excluded={consumer2},
-                labels={
-                    source: "Source",
-                    source.outputs["Grid"]: "G",
-                    consumer2.inputs["Input"]: "V",
-                    grid_to_val2: "G2V",
-                },
-                block=False,
-                show=False,
-                seed=5,
-                save_path=file_path,
+        buffer = io.BytesIO()
+        GraphDiagram().draw(
+            composition,
+            excluded={consumer2},
+            labels={
+                source: "Source",
+                source.outputs["Grid"]: "G",
+                consumer2.inputs["Input"]: "V",
+                grid_to_val2: "G2V",
+            },
+            block=False,
+            show=False,
+            seed=5,
+            save_path=buffer,
+        )
+        self.assertGreater(len(buffer.getvalue()), 0)
+
+    def test_diagram_redraw_after_connect(self):
+        source = _scalar_source()
+        consumer = _scalar_consumer()
+        consumer2 = _scalar_consumer()
+
+        composition = fm.Composition([source, consumer, consumer2])
+        composition.initialize()
+
+        scale = fm.adapters.Scale(1.0)
+        _ = scale >> consumer.inputs["Input"]
+
+        diagram = GraphDiagram()
+        positions = diagram.draw(composition, show=False, max_iterations=10, seed=1)
+        self.assertEqual(set(positions), {source, consumer, consumer2})
+        self.assertIs(
+            diagram.draw(composition, positions=positions, show=False), positions
+        )
+
+        # completing the adapter chain upstream must show up in the next diagram
+        _ = source.outputs["Out"] >> scale
+
+        positions = diagram.draw(composition, show=False, max_iterations=10, seed=1)
+        self.assertEqual(set(positions), {source, scale, consumer, consumer2})
+
+        positions = diagram.draw(
+            composition, excluded=[consumer2], show=False, max_iterations=10, seed=1
+        )
+        self.assertEqual(set(positions), {source, scale, consumer})
+
+    def test_optimize_stops_at_zero_score(self):
+        consumer = _scalar_consumer()
+        consumer2 = _scalar_consumer()
+        composition = fm.Composition([consumer, consumer2])
+        graph = Graph(composition, set())
+
+        out = io.StringIO()
+        with redirect_stdout(out):
+            positions = _optimize_positions(
+                graph, np.random.default_rng(1), False, True, 25000
             )
+
+        self.assertEqual(set(positions), {consumer, consumer2})
+        self.assertIn("(1 iterations, score 0.0)", out.getvalue())